@@ -3,19 +3,159 @@ from PyQt6.QtWidgets import ( # type: ignore
     QApplication, QLabel, QPushButton, QVBoxLayout, QWidget, QMainWindow,
     QCheckBox, QComboBox, QLineEdit, QSlider, QHBoxLayout, QColorDialog,
     QGridLayout, QGroupBox, QScrollArea, QTabWidget, QMessageBox, QTextEdit,
-    QSpinBox
+    QSpinBox, QProgressBar
 )
 from PyQt6.QtGui import QPixmap, QImage, QColor, QIcon # type: ignore
-from PyQt6.QtCore import Qt # type: ignore
-from wp_forge.script import WallpaperForge, load_config, CONFIG_PATH
+from PyQt6.QtCore import Qt, QEvent, QObject, QPoint, QRect, QRunnable, QThreadPool, QTimer, pyqtSignal # type: ignore
+from PIL import Image
+from wp_forge.script import WallpaperForge, RenderCancelled, DownloadCache, load_config, save_config, CACHE_DIR
+
+# config keys that change what gets fetched, so a render cannot reuse earlier resources
+FETCH_CONFIG_KEYS = [
+    "image_source", "custom_url", "show_message", "message_type", "custom_message",
+    "show_weather", "weather_location", "google_font_url"
+]
+
+# builds a QImage on top of the RGB bytes of a PIL image (tobytes() copies the pixels
+# out of PIL once; the QImage then uses that buffer with an explicit stride, no second copy)
+# returns (qimage, data); data must stay referenced for as long as the QImage is used
+def pil_to_qimage(img):
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    data = img.tobytes()
+    return QImage(data, img.width, img.height, img.width * 3, QImage.Format.Format_RGB888), data
+
+# holds the config in memory and writes it back once changes stop coming in
+# changed fires for every key that actually changes; settled fires once the quiet period
+# has passed, right after the write, so previews can follow the same debounced stream
+# flush() writes immediately on focus loss, close() on exit
+class ConfigStore(QObject):
+    changed = pyqtSignal(str, object)
+    settled = pyqtSignal()
+
+    def __init__(self, config, parent=None, quiet_ms=200):
+        super().__init__(parent)
+        self.config = config
+        self.dirty = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(quiet_ms)
+        self.timer.timeout.connect(self.settle)
+
+    def set(self, key, value):
+        if key in self.config and self.config[key] == value:
+            return
+        self.config[key] = value
+        self.dirty.add(key)
+        self.changed.emit(key, value)
+        self.timer.start()
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def flush(self):
+        if not self.dirty:
+            return
+        try:
+            save_config(self.config)
+            self.dirty.clear()
+        except OSError as e:
+            print(f"Could not save config: {e}")
+
+    def settle(self):
+        self.flush()
+        self.settled.emit()
+
+    # final write; no settled signal follows
+    def close(self):
+        self.timer.stop()
+        self.flush()
+
+# signals a render worker sends back to the UI thread, tagged with the request id
+class RenderSignals(QObject):
+    progress = pyqtSignal(int, str, int)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+# runs job(forge) on a thread pool thread and reports its stages through signals
+class RenderWorker(QRunnable):
+    def __init__(self, request_id, forge, job):
+        super().__init__()
+        self.request_id = request_id
+        self.forge = forge
+        self.job = job
+        self.signals = RenderSignals()
+
+    def run(self):
+        self.forge.progress = lambda stage, percent: self.signals.progress.emit(self.request_id, stage, percent)
+        try:
+            result = self.job(self.forge)
+        except RenderCancelled:
+            self.signals.cancelled.emit(self.request_id)
+            return
+        except Exception as e:
+            print(f"Render failed: {e}")
+            self.signals.failed.emit(self.request_id, str(e))
+            return
+        self.signals.finished.emit(self.request_id, result)
+
+    def cancel(self):
+        self.forge.cancel()
+
+# size of the gallery thumbnails
+THUMBNAIL_SIZE = (220, 120)
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(int, object)
+    failed = pyqtSignal(int)
+
+# downloads one gallery image through the download cache and decodes a thumbnail of it
+# JPEG draft mode lets the decoder scale down by up to 8x instead of decoding the full image
+class ThumbnailWorker(QRunnable):
+    def __init__(self, index, url, cache):
+        super().__init__()
+        self.index = index
+        self.url = url
+        self.cache = cache
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        try:
+            entry = self.cache.fetch(self.url, timeout=5, max_age=24 * 3600)
+            if not entry:
+                self.signals.failed.emit(self.index)
+                return
+            with Image.open(entry["path"]) as img:
+                img.draft("RGB", THUMBNAIL_SIZE)
+                thumbnail = img.convert("RGB").resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        except Exception as e:
+            print(f"Thumbnail failed for {self.url}: {e}")
+            self.signals.failed.emit(self.index)
+            return
+        self.signals.loaded.emit(self.index, thumbnail)
 
 class GalleryWidget(QWidget):
     # initalizes the whole application 
+    # thumbnails start as placeholders and are loaded in the background once scrolled near
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
         with open(os.path.join(os.path.dirname(__file__), "backgrounds.json"), "r") as f:
             self.predefined_wallpapers = json.load(f) 
+        self.thumbnail_pool = QThreadPool()
+        self.thumbnail_pool.setMaxThreadCount(4)
+        self.thumbnail_cache = DownloadCache(
+            os.path.join(CACHE_DIR, "downloads"), parent.config.get("download_cache_mb", 200) * 1024 * 1024
+        )
+        self.thumbnails = []
+        self.thumbnail_workers = {}
+        # visibility is checked once pending layout work is done, not mid-resize
+        self.visibility_timer = QTimer(self)
+        self.visibility_timer.setSingleShot(True)
+        self.visibility_timer.setInterval(0)
+        self.visibility_timer.timeout.connect(self.loadVisibleThumbnails)
         self.initUI()
         self.loadGallery()
 
@@ -35,6 +175,7 @@ class GalleryWidget(QWidget):
         self.gallery_layout = QGridLayout(self.gallery_widget)
         
         self.scroll_area.setWidget(self.gallery_widget)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.visibility_timer.start)
         layout.addWidget(self.scroll_area)
         
         self.setLayout(layout)
@@ -45,6 +186,7 @@ class GalleryWidget(QWidget):
             child = self.gallery_layout.itemAt(i).widget()
             if child:
                 child.setParent(None)
+        self.thumbnails = []
         
         if not self.predefined_wallpapers:
             no_files_label = QLabel("No wallpapers available.")
@@ -77,34 +219,19 @@ class GalleryWidget(QWidget):
         item_layout.setSpacing(8)
 
         thumbnail = QLabel()
-        thumbnail.setMinimumSize(220, 120)
-        thumbnail.setMaximumSize(220, 120)
+        thumbnail.setMinimumSize(*THUMBNAIL_SIZE)
+        thumbnail.setMaximumSize(*THUMBNAIL_SIZE)
         thumbnail.setAlignment(Qt.AlignmentFlag.AlignCenter)
         thumbnail.setStyleSheet("""
             border: 1px solid #2c313a;
             background: #181a20;
             border-radius: 4px;
             margin: 2px;
+            color: #888;
+            font-size: 12px;
         """)
-
-        try:
-            import requests
-            from PIL import Image
-            from io import BytesIO
-            
-            response = requests.get(wallpaper_data["url"], timeout=5)
-            if response.status_code == 200:
-                pil_image = Image.open(BytesIO(response.content))
-                pil_image = pil_image.resize((220, 120), Image.Resampling.LANCZOS)
-                pil_image = pil_image.convert('RGB')
-                qimage = QImage(pil_image.tobytes(), pil_image.width, pil_image.height, QImage.Format.Format_RGB888)
-                pixmap = QPixmap.fromImage(qimage)
-                thumbnail.setPixmap(pixmap)
-            else:
-                thumbnail.setText("Preview\nUnavailable")
-        except Exception:
-            thumbnail.setText(f"{wallpaper_data['name']}\nPreview")
-            thumbnail.setStyleSheet(thumbnail.styleSheet() + "color: #888; font-size: 12px;")
+        thumbnail.setText("Loading...")
+        self.thumbnails.append({"widget": item_widget, "label": thumbnail, "data": wallpaper_data, "state": "pending"})
         
         item_layout.addWidget(thumbnail)
         
@@ -181,11 +308,53 @@ class GalleryWidget(QWidget):
         
         self.gallery_layout.addWidget(item_widget, row, col)
 
+    # starts loading thumbnails for cells within one viewport height of the visible area
+    def loadVisibleThumbnails(self):
+        viewport = self.scroll_area.viewport()
+        area = viewport.rect().adjusted(0, -viewport.height(), 0, viewport.height())
+        for index, item in enumerate(self.thumbnails):
+            if item["state"] != "pending":
+                continue
+            widget = item["widget"]
+            rect = QRect(widget.mapTo(viewport, QPoint(0, 0)), widget.size())
+            if not rect.intersects(area):
+                continue
+            item["state"] = "loading"
+            worker = ThumbnailWorker(index, item["data"]["url"], self.thumbnail_cache)
+            worker.signals.loaded.connect(self.thumbnailLoaded)
+            worker.signals.failed.connect(self.thumbnailFailed)
+            self.thumbnail_workers[index] = worker
+            self.thumbnail_pool.start(worker)
+
+    def thumbnailLoaded(self, index, img):
+        self.thumbnail_workers.pop(index, None)
+        if index >= len(self.thumbnails):
+            return
+        item = self.thumbnails[index]
+        item["state"] = "loaded"
+        qimage, data = pil_to_qimage(img)
+        item["label"].setPixmap(QPixmap.fromImage(qimage))
+
+    def thumbnailFailed(self, index):
+        self.thumbnail_workers.pop(index, None)
+        if index >= len(self.thumbnails):
+            return
+        item = self.thumbnails[index]
+        item["state"] = "failed"
+        item["label"].setText(f"{item['data']['name']}\nPreview")
+
+    # the layout is only final once shown, so visibility is checked then and on resize
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.visibility_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.visibility_timer.start()
+
     # selects a wallpaper and prints a message
     def selectWallpaper(self, wallpaper_data):
-        self.parent.config["image_source"] = "Custom URL"
-        self.parent.config["custom_url"] = wallpaper_data["url"]
-        self.parent.saveConfig()
+        self.parent.store.update({"image_source": "Custom URL", "custom_url": wallpaper_data["url"]})
         
         self.parent.sourceCombo.setCurrentText("Custom URL")
         self.parent.urlInput.setText(wallpaper_data["url"])
@@ -199,18 +368,14 @@ class GalleryWidget(QWidget):
         )
 
     # previews the selected wallpaper in the main tab
+    # renders in the background with a copy of the config pointed at the gallery image
     def previewWallpaper(self, wallpaper_data):
-        original_source = self.parent.config["image_source"]
-        original_url = self.parent.config.get("custom_url", "")
-        
-        self.parent.config["image_source"] = "Custom URL"
-        self.parent.config["custom_url"] = wallpaper_data["url"]
+        config = dict(self.parent.config, image_source="Custom URL", custom_url=wallpaper_data["url"])
+        forge = WallpaperForge(config)
 
-        try: 
-            forge = WallpaperForge(self.parent.config)
-            preview_path = forge.generateWallpaper()
-            self.parent.showPreview(preview_path)
-            self.parent.imagePath = preview_path
+        def done(result):
+            overrides = {"image_source": "Custom URL", "custom_url": wallpaper_data["url"]}
+            self.parent.previewReady(forge, result, overrides)
             
             self.parent.tab_widget.setCurrentIndex(0)
             
@@ -219,12 +384,11 @@ class GalleryWidget(QWidget):
                 "Preview Generated", 
                 f"Preview of '{wallpaper_data['name']}' generated with your current settings.\n\nIf you like it, click 'Apply' to set it as your wallpaper."
             )
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Preview Error", f"Failed to generate preview: {str(e)}")
-        finally:
-            self.parent.config["image_source"] = original_source
-            self.parent.config["custom_url"] = original_url 
+
+        def failed(message):
+            QMessageBox.critical(self, "Preview Error", f"Failed to generate preview: {message}")
+
+        self.parent.startRender(forge, lambda f: f.generatePreview(), done, failed)
 
 class WallpaperApp(QMainWindow):
     # initializes the main application window
@@ -237,12 +401,18 @@ class WallpaperApp(QMainWindow):
             self.setWindowIcon(QIcon("icon.png"))
         
         self.config = load_config()
+        # only the newest render request per slot is kept; starting one cancels the one in flight
+        self.render_pool = QThreadPool()
+        self.render_pool.setMaxThreadCount(2)
+        self.render_id = 0
+        self.render_latest = {}
+        self.render_workers = {}
+        self.render_callbacks = {}
+        self.progress_id = None
+        # settings are written and a small proxy preview is rendered once the user pauses
+        self.store = ConfigStore(self.config, self)
+        self.store.settled.connect(self.livePreview)
         self.initUI()
-    
-    # saves the current configuration to a JSON file
-    def saveConfig(self):
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(self.config, f, indent=2)
 
     # initializes the UI components
     def initUI(self):
@@ -263,6 +433,11 @@ class WallpaperApp(QMainWindow):
         
         self.forge = WallpaperForge(self.config)
         self.imagePath = None
+        # full-resolution frame behind the preview; it is only written to disk on Apply
+        self.frame = None
+        self.preview_buffer = None
+        # config keys a gallery preview overrides without saving them (see renderConfig)
+        self.preview_overrides = {}
         self.generate()
 
     # sets up the main tab UI components
@@ -287,7 +462,13 @@ class WallpaperApp(QMainWindow):
         self.genBtn.clicked.connect(self.generate)
         self.applyBtn.clicked.connect(self.apply)
 
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setMaximumWidth(400)
+        self.progressBar.setVisible(False)
+
         left_layout.addWidget(self.preview)
+        left_layout.addWidget(self.progressBar)
         left_layout.addLayout(button_layout)
         left_layout.addStretch()
         left_widget.setLayout(left_layout)
@@ -665,9 +846,7 @@ class WallpaperApp(QMainWindow):
             "noise_intensity": 25
         }
         
-        for key, value in filter_defaults.items():
-            self.config[key] = value
-        self.saveConfig()
+        self.store.update(filter_defaults)
 
         self.brightnessSlider.setValue(100)
         self.contrastSlider.setValue(100)
@@ -691,38 +870,30 @@ class WallpaperApp(QMainWindow):
 
     # bunch of update methods to handle changes in the configuration
     def updateConfig(self, key, value):
-        self.config[key] = value
-        self.saveConfig()
+        self.store.set(key, value)
 
     def updateWeatherLocation(self, location):
-        self.config["weather_location"] = location
-        self.saveConfig()
+        self.store.set("weather_location", location)
 
     def changeSource(self, value):
-        self.config["image_source"] = value
-        self.saveConfig()
+        self.store.set("image_source", value)
         self.urlInput.setVisible(value == "Custom URL")
 
     def updateUrl(self, url):
-        self.config["custom_url"] = url
-        self.saveConfig()
+        self.store.set("custom_url", url)
 
     def updateFontUrl(self, url):
-        self.config["google_font_url"] = url
-        self.saveConfig() 
+        self.store.set("google_font_url", url)
 
     def updateMessageType(self, value):
-        self.config["message_type"] = value
-        self.saveConfig()
+        self.store.set("message_type", value)
         self.customMessageInput.setVisible(value == "Custom")
 
     def updateCustomMessage(self):
-        self.config["custom_message"] = self.customMessageInput.toPlainText()
-        self.saveConfig()
+        self.store.set("custom_message", self.customMessageInput.toPlainText())
 
     def updateTimeDisplay(self, value):
-        self.config["time_display"] = value
-        self.saveConfig()
+        self.store.set("time_display", value)
 
     def chooseColor(self):
         current_color = QColor(self.config.get("overlay_color", "#000000"))
@@ -731,8 +902,7 @@ class WallpaperApp(QMainWindow):
         
         if color.isValid():
             hex_color = color.name()
-            self.config["overlay_color"] = hex_color
-            self.saveConfig()
+            self.store.set("overlay_color", hex_color)
             self.updateColorButton()
 
     def updateColorButton(self):
@@ -741,86 +911,204 @@ class WallpaperApp(QMainWindow):
         self.colorBtn.setText("Color")
 
     def updateOverlayEnabled(self, state):
-        self.config["overlay_enabled"] = bool(state)
-        self.saveConfig()
+        self.store.set("overlay_enabled", bool(state))
 
     def updateOpacity(self, value):
-        self.config["overlay_opacity"] = value
+        self.store.set("overlay_opacity", value)
         self.opacityLabel.setText(str(value))
-        self.saveConfig()
 
     def updateMessageFontSize(self, value):
-        self.config["font_size_message"] = value
+        self.store.set("font_size_message", value)
         self.messageFontLabel.setText(str(value))
-        self.saveConfig()
 
     def updateWeatherFontSize(self, value):
-        self.config["font_size_weather"] = value
+        self.store.set("font_size_weather", value)
         self.weatherFontLabel.setText(str(value))
-        self.saveConfig()
 
     def updateTimeFontSize(self, value):
-        self.config["font_size_time"] = value
+        self.store.set("font_size_time", value)
         self.timeFontLabel.setText(str(value))
-        self.saveConfig()
 
     def updateBrightness(self, value):
-        self.config["brightness"] = value
+        self.store.set("brightness", value)
         self.brightnessLabel.setText(str(value))
-        self.saveConfig()
 
     def updateContrast(self, value):
-        self.config["contrast"] = value
+        self.store.set("contrast", value)
         self.contrastLabel.setText(str(value))
-        self.saveConfig()
 
     def updateSaturation(self, value):
-        self.config["saturation"] = value
+        self.store.set("saturation", value)
         self.saturationLabel.setText(str(value))
-        self.saveConfig()
 
     def updateSharpness(self, value):
-        self.config["sharpness"] = value
+        self.store.set("sharpness", value)
         self.sharpnessLabel.setText(str(value))
-        self.saveConfig()
 
     def updateBlurIntensity(self, value):
-        self.config["blur_intensity"] = value
+        self.store.set("blur_intensity", value)
         self.blurIntensityLabel.setText(str(value))
-        self.saveConfig()
 
     def updateVintageIntensity(self, value):
-        self.config["vintage_intensity"] = value
+        self.store.set("vintage_intensity", value)
         self.vintageIntensityLabel.setText(str(value))
-        self.saveConfig()
 
     def updateVignetteIntensity(self, value):
-        self.config["vignette_intensity"] = value
+        self.store.set("vignette_intensity", value)
         self.vignetteIntensityLabel.setText(str(value))
-        self.saveConfig()
 
     def updateNoiseIntensity(self, value):
-        self.config["noise_intensity"] = value
+        self.store.set("noise_intensity", value)
         self.noiseIntensityLabel.setText(str(value))
-        self.saveConfig()
 
     def updatePosterizeBits(self, value):
-        self.config["posterize_bits"] = value
-        self.saveConfig()
+        self.store.set("posterize_bits", value)
 
+    # renders in the background and shows the result; Apply keeps using the previous
+    # frame until this one lands, and nothing is written until Apply is clicked
     def generate(self):
-        self.forge = WallpaperForge(self.config)
-        self.imagePath = self.forge.generateWallpaper()
-        self.showPreview(self.imagePath)
+        forge = WallpaperForge(dict(self.config))
+
+        def failed(message):
+            QMessageBox.critical(self, "Generation Error", f"Failed to generate wallpaper: {message}")
+
+        self.startRender(forge, lambda f: f.generatePreview(), lambda result: self.previewReady(forge, result), failed)
+
+    # keeps the frame from generatePreview for Apply and shows its thumbnail
+    # overrides are the unsaved config changes the frame was rendered with (gallery previews)
+    def previewReady(self, forge, result, overrides=None):
+        self.forge = forge
+        self.preview_overrides = dict(overrides or {})
+        self.frame, thumbnail = result
+        self.showPreview(thumbnail)
 
+    # the config the current preview stands for: the saved settings plus any preview overrides
+    def renderConfig(self):
+        return dict(self.config, **self.preview_overrides)
+
+    # re-renders the preview at 1/4 resolution with the resources of the last generate
+    # nothing is fetched or written, so slider changes show up in a few tens of ms
+    # a change to any fetch input (source, message, weather, font) needs a full generate instead
+    def livePreview(self):
+        resources = self.forge.last_resources
+        if resources is None:
+            return
+        config = self.renderConfig()
+        if any(self.forge.config.get(key) != config.get(key) for key in FETCH_CONFIG_KEYS):
+            self.generate()
+            return
+        forge = WallpaperForge(config)
+        forge.font_path = self.forge.font_path
+        job = lambda f: f.generateWallpaper(proxy_scale=0.25, resources=resources)
+        self.startRender(forge, job, self.showPreview, slot="preview")
+
+    # runs job(forge) on the render pool, cancelling whatever render is still in flight in slot
+    # done(result) or failed(message) is called on the UI thread, and only for the newest request
+    def startRender(self, forge, job, done, failed=None, slot="generate"):
+        self.cancelRender(slot)
+        self.render_id += 1
+        worker = RenderWorker(self.render_id, forge, job)
+        worker.signals.progress.connect(self.renderProgress)
+        worker.signals.finished.connect(self.renderFinished)
+        worker.signals.failed.connect(self.renderFailed)
+        worker.signals.cancelled.connect(self.renderCancelled)
+        self.render_callbacks[self.render_id] = (slot, worker, done, failed)
+        self.render_latest[slot] = self.render_id
+        self.render_workers[slot] = worker
+        if slot != "preview":
+            self.progress_id = self.render_id
+            self.progressBar.setValue(0)
+            self.progressBar.setFormat("Starting...")
+            self.progressBar.setVisible(True)
+        self.render_pool.start(worker)
+
+    def cancelRender(self, slot=None):
+        for name in [slot] if slot else list(self.render_workers):
+            worker = self.render_workers.pop(name, None)
+            if worker is not None:
+                worker.cancel()
+
+    # pops the callbacks for a finished request, or returns None if a newer one replaced it
+    def takeRender(self, request_id):
+        slot, worker, done, failed = self.render_callbacks.pop(request_id, (None, None, None, None))
+        if slot is None or self.render_latest.get(slot) != request_id:
+            return None
+        self.render_workers.pop(slot, None)
+        if request_id == self.progress_id:
+            self.progressBar.setVisible(False)
+        return done, failed
+
+    def renderProgress(self, request_id, stage, percent):
+        if request_id == self.progress_id:
+            self.progressBar.setValue(percent)
+            self.progressBar.setFormat(f"{stage}... %p%")
+
+    def renderFinished(self, request_id, result):
+        callbacks = self.takeRender(request_id)
+        if callbacks and callbacks[0]:
+            callbacks[0](result)
+
+    def renderFailed(self, request_id, message):
+        callbacks = self.takeRender(request_id)
+        if callbacks and callbacks[1]:
+            callbacks[1](message)
+
+    def renderCancelled(self, request_id):
+        self.render_callbacks.pop(request_id, None)
+        if request_id == self.progress_id:
+            self.progressBar.setVisible(False)
+
+    # writes the previewed frame and sets it as the wallpaper, off the UI thread
+    # settings changed since the last generate are rendered in first, refetching only if needed
+    # every Apply gets its own forge, so cancelling a superseded one cannot affect the next
     def apply(self):
-        if self.imagePath:
-            self.forge.setWallpaper()
+        source = self.forge
+        if source.last_resources is None:
+            return
+        config = self.renderConfig()
+        refetch = any(source.config.get(key) != config.get(key) for key in FETCH_CONFIG_KEYS)
+        forge = WallpaperForge(config)
+        if not refetch:
+            forge.font_path = source.font_path
+        rerender = self.frame is None or source.config != config
+        if not rerender:
+            frame = self.frame
+            forge.preview_fingerprint = source.preview_fingerprint
+            job = lambda f: f.applyFrame(frame)
+        else:
+            resources = None if refetch else source.last_resources
+            job = lambda f: f.applyFrame(resources=resources)
+
+        # a re-rendered Apply becomes the new base for previews, unless a newer generate landed
+        def done(path):
+            if rerender and self.forge is source:
+                self.forge, self.frame = forge, None
+            self.imagePath = path
+
+        def failed(message):
+            QMessageBox.critical(self, "Apply Error", f"Failed to apply wallpaper: {message}")
+
+        self.startRender(forge, job, done, failed, slot="apply")
+
+    # shows an in-memory PIL image in the preview label
+    # images that already fit (thumbnails, proxy renders) are shown without rescaling
+    def showPreview(self, img):
+        qimage, self.preview_buffer = pil_to_qimage(img)
+        if img.width > 400 or img.height > 225:
+            qimage = qimage.scaled(400, 225, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.preview.setPixmap(QPixmap.fromImage(qimage))
+
+    # writes pending settings when the window loses focus
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.ActivationChange and not self.isActiveWindow():
+            self.store.flush()
+        super().changeEvent(event)
 
-    def showPreview(self, path):
-        img = QImage(path)
-        pixmap = QPixmap.fromImage(img.scaled(400, 225, Qt.AspectRatioMode.KeepAspectRatio))
-        self.preview.setPixmap(pixmap)
+    # writes pending settings and stops any render in flight so closing does not wait for it
+    def closeEvent(self, event):
+        self.store.close()
+        self.cancelRender()
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
@@ -829,6 +1117,7 @@ def main():
         app.setWindowIcon(QIcon("icon.png"))
     
     window = WallpaperApp()
+    app.aboutToQuit.connect(window.store.close)
     window.show()
     sys.exit(app.exec())
 
@@ -1,13 +1,21 @@
-import sys, os, json, subprocess
+import sys, os, json, subprocess, hashlib, threading, time, random, struct, zlib
 from datetime import datetime
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageChops
 import requests # type: ignore 
+from requests.adapters import HTTPAdapter # type: ignore
 from textwrap import wrap
 import numpy as np # type: ignore
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 # set constants
 CONFIG_PATH = os.path.expanduser("~/.wallpaper_forge_config.json")
+WALLPAPER_DIR = os.path.expanduser("~/.wallpaper_forge/")
+CACHE_DIR = os.path.join(WALLPAPER_DIR, "cache")
+LAST_RENDER_PATH = os.path.join(WALLPAPER_DIR, "last_render.json")
+# full output resolution; proxy renders scale this and every pixel size down
+WALLPAPER_SIZE = (3840, 2160)
 DEFAULT_CONFIG = { 
     "show_message": True,
     "time_display": "Time",
@@ -43,42 +51,714 @@ DEFAULT_CONFIG = {
     "edge_enhance_enabled": False,
     "emboss_enabled": False,
     "noise_enabled": False,
-    "noise_intensity": 25
+    "noise_intensity": 25,
+    "noise_seed": None,
+    "download_cache_mb": 200,
+    "base_cache_entries": 8,
+    "filter_lut_enabled": True,
+    "filter_workers": 0,
+    "fetch_deadline": 30,
+    "retry": {},
+    "font_revalidate_hours": 24,
+    "full_refresh_minutes": 30,
+    "output_format": "PNG",
+    "png_compress_level": 6,
+    "jpeg_quality": 90,
+    "jpeg_subsampling": "4:2:0",
+    "webp_lossless": False,
+    "webp_quality": 90,
+    "png_parallel": False,
+    "encoder_workers": 0,
+    "retention": {},
+    "retention_interval_minutes": 10
 }
 
+# file extension for each supported output format
+OUTPUT_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+# encoder settings tried by benchmark mode, as (format, options) pairs
+BENCHMARK_ENCODERS = [
+    ("PNG", {"compress_level": 1}),
+    ("PNG", {"compress_level": 3}),
+    ("PNG", {"compress_level": 6}),
+    ("PNG", {"compress_level": 9}),
+    ("JPEG", {"quality": 85, "subsampling": "4:2:0"}),
+    ("JPEG", {"quality": 95, "subsampling": "4:2:0"}),
+    ("JPEG", {"quality": 95, "subsampling": "4:4:4"}),
+    ("WEBP", {"lossless": False, "quality": 85}),
+    ("WEBP", {"lossless": False, "quality": 95}),
+    ("WEBP", {"lossless": True, "quality": 50}),
+]
+
+# retry settings per kind of fetch, overridable per kind through the "retry" config key
+# timeout is per attempt and deadline bounds all attempts plus backoff, both in seconds
+RETRY_DEFAULTS = {
+    "image": {"attempts": 3, "timeout": 15, "deadline": 45, "base_delay": 1.0, "max_delay": 8.0},
+    "font": {"attempts": 2, "timeout": 10, "deadline": 20, "base_delay": 1.0, "max_delay": 4.0},
+    "quote": {"attempts": 2, "timeout": 5, "deadline": 10, "base_delay": 0.5, "max_delay": 2.0},
+    "weather": {"attempts": 2, "timeout": 5, "deadline": 10, "base_delay": 0.5, "max_delay": 2.0},
+}
+
+# retention quotas per kind of file, overridable per kind through the "retention" config key
+# None means no limit; wallpapers, fonts and temp files live in WALLPAPER_DIR, the rest under CACHE_DIR
+# "fonts" are the font_*.ttf files older versions left behind, which nothing reads any more
+RETENTION_DEFAULTS = {
+    "wallpapers": {"max_count": 3, "max_mb": 500, "max_age_hours": 168},
+    "fonts": {"max_count": 0, "max_mb": None, "max_age_hours": None},
+    "temp": {"max_count": None, "max_mb": None, "max_age_hours": 1},
+    "cache": {"max_count": None, "max_mb": 2048, "max_age_hours": 720},
+}
+
+# config keys that change the base layer (everything except the text layers)
+BASE_LAYER_CONFIG_KEYS = [
+    "filters_enabled", "blur_enabled", "blur_intensity", "brightness", "contrast",
+    "saturation", "sharpness", "vintage_enabled", "vintage_intensity",
+    "vignette_enabled", "vignette_intensity", "sepia_enabled", "grayscale_enabled",
+    "invert_enabled", "posterize_enabled", "posterize_bits", "edge_enhance_enabled",
+    "emboss_enabled", "noise_enabled", "noise_intensity", "noise_seed",
+    "overlay_enabled", "overlay_color", "overlay_opacity"
+]
+
+# side length of the pre-generated film grain tiles
+NOISE_TILE_SIZE = 512
+# grid size of compiled 3D color LUTs
+COLOR_LUT_SIZE = 33
+# color ops that act on each channel independently and fold into a 1D point() table
+CHANNEL_OPS = ("brightness", "contrast", "invert")
+# rough cost of each full-frame pass, relative to a 1D point() pass
+COLOR_PASS_COST = {"point": 1, "grayscale": 1, "tint": 2, "saturation": 3, "sepia": 8, "lut": 11}
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131]
+])
+
+# luma as computed by PIL's convert("L"), for an (N, 3) array of 0..255 values
+def luma(rgb):
+    return np.floor((rgb @ np.array([19595, 38470, 7471]) + 32768) / 65536)[:, None]
+
+# PIL's Image.blend(base, rgb, factor) with its clipping and truncation
+def blend(base, rgb, factor):
+    return np.clip(np.trunc(base + factor * (rgb - base)), 0, 255)
+
+# applies a sequence of per-pixel color ops to an (N, 3) float array of 0..255 values
+# each op mirrors the PIL/NumPy step it replaces in applyImageFilters
+def apply_color_ops(rgb, ops):
+    for op in ops:
+        name = op[0]
+        if name == "brightness":
+            rgb = blend(0.0, rgb, op[1])
+        elif name == "contrast":
+            rgb = blend(float(op[2]), rgb, op[1])
+        elif name == "saturation":
+            rgb = blend(luma(rgb), rgb, op[1])
+        elif name == "grayscale":
+            rgb = np.repeat(luma(rgb), 3, axis=1)
+        elif name == "sepia":
+            rgb = np.floor(np.clip(rgb @ SEPIA_MATRIX.T, 0, 255))
+        elif name == "invert":
+            rgb = 255 - rgb
+        elif name == "tint":
+            rgb = blend(rgb, np.array(op[1], dtype=np.float64), op[2])
+    return rgb
+
+# folds per-channel color ops into a 768-entry table for Image.point (exact)
+def compile_point_table(ops):
+    ramp = np.repeat(np.arange(256, dtype=np.float64)[:, None], 3, axis=1)
+    return apply_color_ops(ramp, ops).T.astype(np.uint8).reshape(-1).tolist()
+
+# folds color ops into a single Color3DLUT
+# trilinear interpolation between grid nodes keeps the result close to running
+# the ops one by one: mean error under 1 level, max 4 on typical settings and
+# up to 9 when every color filter is stacked at its extreme
+def compile_color_lut(ops):
+    grid = np.linspace(0, 255, COLOR_LUT_SIZE)
+    b, g, r = np.meshgrid(grid, grid, grid, indexing="ij")
+    rgb = np.stack([r, g, b], axis=-1).reshape(-1, 3)
+    table = apply_color_ops(rgb, ops) / 255.0
+    return ImageFilter.Color3DLUT(COLOR_LUT_SIZE, table.reshape(-1))
+
+# compiles a run of color ops into the cheapest list of passes, cached by the op values
+# per-channel ops always merge into point() passes; the whole run becomes one 3D LUT
+# pass when that is cheaper than the remaining cross-channel passes
+@lru_cache(maxsize=32)
+def compile_color_passes(ops):
+    passes, channel_run = [], []
+    for op in ops:
+        if op[0] in CHANNEL_OPS:
+            channel_run.append(op)
+            continue
+        if channel_run:
+            passes.append(("point", compile_point_table(tuple(channel_run))))
+            channel_run = []
+        passes.append(("op", op))
+    if channel_run:
+        passes.append(("point", compile_point_table(tuple(channel_run))))
+
+    cost = sum(COLOR_PASS_COST[kind if kind == "point" else value[0]] for kind, value in passes)
+    if len(passes) > 1 and cost > COLOR_PASS_COST["lut"]:
+        return [("lut", compile_color_lut(ops))]
+    return passes
+
+# thread pools used for tiled filtering and parallel encoding, shared per worker count
+filter_pools = {}
+filter_pools_lock = threading.Lock()
+
+def filter_pool(workers):
+    with filter_pools_lock:
+        if workers not in filter_pools:
+            filter_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wp-filter")
+        return filter_pools[workers]
+
+# rows of context a GaussianBlur of this radius reads on each side
+# PIL runs three extended box blurs of roughly the same radius
+def blur_halo(radius):
+    return 3 * (int(radius) + 2)
+
+# single background thread that encodes and writes wallpapers in submission order
+writer_pool = None
+
+def wallpaper_writer():
+    global writer_pool
+    with filter_pools_lock:
+        if writer_pool is None:
+            writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wp-writer")
+        return writer_pool
+
+# builds the vignette mask as an RGB image for ImageChops.multiply, cached per size and intensity
+# brightness falls off quadratically from 1 at the center to (1 - intensity) in the corners
+@lru_cache(maxsize=4)
+def vignette_mask(width, height, intensity):
+    x = np.linspace(-1, 1, width, dtype=np.float32)
+    y = np.linspace(-1, 1, height, dtype=np.float32)[:, None]
+    falloff = (x * x + y * y) * np.float32(intensity / 2)
+    mask = (np.float32(255) * (np.float32(1) - falloff) + np.float32(0.5)).astype(np.uint8)
+    return Image.fromarray(mask).convert("RGB")
+
+# process-wide HTTP session, shared by every forge and the GUI gallery
+# pooled keep-alive connections avoid a new TCP+TLS handshake per request
+http_session = None
+http_session_lock = threading.Lock()
+
+def get_session():
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            http_session = session
+        return http_session
+
+# bounded retries with jittered exponential backoff and an overall wall-clock deadline
+class RetryPolicy:
+    def __init__(self, attempts=3, timeout=15, deadline=45, base_delay=1.0, max_delay=8.0):
+        self.attempts = attempts
+        self.timeout = timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    # calls fn(timeout) until it returns something other than None
+    # exceptions and None both count as a failed attempt; gives up with None
+    def call(self, fn, label):
+        start = time.monotonic()
+        for attempt in range(self.attempts):
+            remaining = self.deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            try:
+                result = fn(min(self.timeout, remaining))
+                if result is not None:
+                    return result
+            except Exception as e:
+                print(f"{label} failed (attempt {attempt+1}): {e}")
+
+            if attempt + 1 < self.attempts:
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if time.monotonic() - start + delay >= self.deadline:
+                    break
+                time.sleep(delay)
+        print(f"{label} gave up after {time.monotonic() - start:.1f}s")
+        return None
+
+# process-wide cache of parsed fonts keyed by (path, size, index)
+# falls back to PIL's default font if the file is missing or unreadable
+@lru_cache(maxsize=64)
+def load_font(path, size, index=0):
+    try:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size, index=index)
+    except Exception as e:
+        print(f"Could not load font {path}: {e}")
+    return ImageFont.load_default()
+
+# splits text into lines of at most 40 characters, keeping explicit line breaks
+def wrap_lines(text):
+    lines = []
+    for paragraph in text.split('\n'):
+        lines.extend(wrap(paragraph, width=40))
+    return lines
+
+# finds the largest font size, stepping down by 5 from max_font_size, at which text fits the box
+# wrapping does not depend on the size, so only the measuring is repeated during the binary search
+# layouts are cached by (text, font, sizes, box) so repeated quotes and greetings skip measuring
+@lru_cache(maxsize=256)
+def fit_text_layout(text, font_path, max_width, max_height, max_font_size, min_font_size):
+    lines = tuple(wrap_lines(text))
+    sizes = list(range(max_font_size, min_font_size - 1, -5))
+
+    def fits(size):
+        font = load_font(font_path, size)
+        line_height = font.getbbox("A")[3] + 10
+        if line_height * len(lines) > max_height:
+            return False
+        return max((font.getlength(line) for line in lines), default=0) <= max_width
+
+    low, high = 0, len(sizes)
+    while low < high:
+        mid = (low + high) // 2
+        if fits(sizes[mid]):
+            high = mid
+        else:
+            low = mid + 1
+    return (sizes[low] if low < len(sizes) else None), lines
+
+# rasterizes lines of text once into a tight "L" mask, cached by lines, font and spacing
+# returns the mask and its offset from the block origin
+@lru_cache(maxsize=64)
+def text_mask(lines, font, line_height):
+    boxes = []
+    for i, line in enumerate(lines):
+        left, top, right, bottom = font.getbbox(line)
+        boxes.append((left, top + i * line_height, right, bottom + i * line_height))
+    x0 = min(box[0] for box in boxes)
+    y0 = min(box[1] for box in boxes)
+    x1 = max(box[2] for box in boxes)
+    y1 = max(box[3] for box in boxes)
+
+    mask = Image.new("L", (max(1, x1 - x0), max(1, y1 - y0)), 0)
+    draw = ImageDraw.Draw(mask)
+    for i, line in enumerate(lines):
+        draw.text((-x0, i * line_height - y0), line, font=font, fill=255)
+    return mask, (x0, y0)
+
+# PNG Paeth filter (type 4) for rows top..bottom of an (H, W, C) uint8 array
+# every predictor comes from the original pixels, so the whole band is filtered at once
+def paeth_filter_rows(pixels, top, bottom):
+    channels = pixels.shape[2]
+    rows = pixels[top:bottom].reshape(bottom - top, -1).astype(np.int16)
+    if top > 0:
+        up = pixels[top - 1:bottom - 1].reshape(bottom - top, -1).astype(np.int16)
+    else:
+        up = np.vstack([np.zeros((1, rows.shape[1]), np.int16), rows[:-1]])
+    left = np.zeros_like(rows)
+    left[:, channels:] = rows[:, :-channels]
+    up_left = np.zeros_like(rows)
+    up_left[:, channels:] = up[:, :-channels]
+
+    pa = np.abs(up - up_left)
+    pb = np.abs(left - up_left)
+    pc = np.abs(left + up - 2 * up_left)
+    predictor = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+
+    out = np.empty((bottom - top, rows.shape[1] + 1), np.uint8)
+    out[:, 0] = 4
+    out[:, 1:] = (rows - predictor).astype(np.uint8)
+    return out
+
+# writes a PNG chunk with its length and CRC
+def write_png_chunk(fp, chunk_type, data):
+    fp.write(struct.pack(">I", len(data)))
+    fp.write(chunk_type + data)
+    fp.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+# writes img to fp as a PNG, deflating bands of scanlines in parallel, pigz-style
+# each band is filtered and compressed on its own thread, primed with the last 32 KiB of the
+# previous band; all but the last band end on a sync flush, so the pieces concatenate into
+# one valid zlib stream (zlib releases the GIL, so bands really run side by side)
+def write_png_parallel(img, fp, compress_level=6, workers=None):
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    pixels = np.asarray(img)
+    height, width, channels = pixels.shape
+    workers = workers or os.cpu_count() or 1
+    stride = width * channels + 1
+    band_rows = max(16, -(-height // (workers * 4)))
+    window_rows = -(-32768 // stride)
+    tops = list(range(0, height, band_rows))
+
+    def compress(top):
+        bottom = min(height, top + band_rows)
+        raw = paeth_filter_rows(pixels, top, bottom).tobytes()
+        options = {}
+        if top > 0:
+            dict_top = max(0, top - window_rows)
+            options["zdict"] = paeth_filter_rows(pixels, dict_top, top).tobytes()[-32768:]
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, **options)
+        flush_mode = zlib.Z_FINISH if bottom == height else zlib.Z_SYNC_FLUSH
+        return zlib.adler32(raw), len(raw), compressor.compress(raw) + compressor.flush(flush_mode)
+
+    fp.write(b"\x89PNG\r\n\x1a\n")
+    color_type = 6 if channels == 4 else 2
+    write_png_chunk(fp, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    level_flags = {0: 0x01, 1: 0x01, 2: 0x5e, 3: 0x5e, 4: 0x5e, 5: 0x5e, 6: 0x9c}
+    write_png_chunk(fp, b"IDAT", bytes([0x78, level_flags.get(compress_level, 0xda)]))
+    checksum = 1
+    for band_checksum, length, data in filter_pool(workers).map(compress, tops):
+        checksum = adler32_combine(checksum, band_checksum, length)
+        write_png_chunk(fp, b"IDAT", data)
+    write_png_chunk(fp, b"IDAT", struct.pack(">I", checksum))
+    write_png_chunk(fp, b"IEND", b"")
+
+# combines the Adler-32 of two byte strings given the length of the second (zlib's adler32_combine)
+def adler32_combine(adler1, adler2, length2):
+    base = 65521
+    remainder = length2 % base
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % base
+    sum1 += (adler2 & 0xffff) + base - 1
+    sum2 += ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + base - remainder
+    sum1 %= base
+    sum2 %= base
+    return (sum2 << 16) | sum1
+
+# writes data to a temp file next to path and renames it into place
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# one lock per index file, shared by every DownloadCache that points at it
+# (each forge and the GUI gallery open their own instance over the same directory)
+index_locks = {}
+index_locks_lock = threading.Lock()
+
+def index_lock(index_path):
+    with index_locks_lock:
+        return index_locks.setdefault(os.path.abspath(index_path), threading.Lock())
+
+# persistent LRU cache for downloads, keyed by URL and stored by content hash
+# entries keep ETag/Last-Modified so unchanged files only cost a 304 round trip
+class DownloadCache:
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, session=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.session = session or get_session()
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = index_lock(self.index_path)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def blobPath(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.bin")
+
+    def loadIndex(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def saveIndex(self, index):
+        write_atomic(self.index_path, json.dumps(index, indent=2).encode())
+
+    # returns the cached entry for url if its file is still on disk
+    def lookup(self, url):
+        entry = self.loadIndex().get(url)
+        if entry and os.path.exists(self.blobPath(entry["digest"])):
+            return dict(entry, path=self.blobPath(entry["digest"]))
+        return None
+
+    # downloads url (or revalidates the cached copy) and returns its entry
+    # the entry has the local file path and the sha256 digest of the content
+    # copies validated less than max_age seconds ago are returned without a request
+    def fetch(self, url, timeout=15, max_age=None):
+        entry = self.lookup(url)
+        if entry and max_age and time.time() - entry.get("validated", 0) < max_age:
+            return self.touch(url, entry)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            if entry:
+                print(f"Revalidation failed ({e}), using cached copy")
+                return self.touch(url, entry)
+            raise
+
+        if response.status_code == 304 and entry:
+            print("Cached copy is still valid")
+            entry["validated"] = time.time()
+            return self.touch(url, entry)
+        if response.status_code != 200:
+            print(f"Download failed with status: {response.status_code}")
+            if entry:
+                print("Using cached copy")
+                return self.touch(url, entry)
+            return None
+
+        data = response.content
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.blobPath(digest)):
+            write_atomic(self.blobPath(digest), data)
+        entry = {
+            "digest": digest,
+            "size": len(data),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "validated": time.time(),
+        }
+        return self.touch(url, entry)
+
+    # records entry as most recently used and evicts down to the size limit
+    def touch(self, url, entry):
+        entry = {key: value for key, value in entry.items() if key != "path"}
+        entry["last_used"] = time.time()
+        try:
+            os.utime(self.blobPath(entry["digest"]))
+        except OSError:
+            pass
+        with self.lock:
+            index = self.loadIndex()
+            index[url] = entry
+            self.evict(index)
+            self.saveIndex(index)
+        return dict(entry, path=self.blobPath(entry["digest"]))
+
+    # drops least recently used URLs until the unique blobs fit in max_bytes
+    def evict(self, index):
+        def blob_bytes():
+            return sum({e["digest"]: e["size"] for e in index.values()}.values())
+
+        for url in sorted(index, key=lambda u: index[u].get("last_used", 0)):
+            if blob_bytes() <= self.max_bytes or len(index) <= 1:
+                break
+            digest = index.pop(url)["digest"]
+            if all(e["digest"] != digest for e in index.values()):
+                try:
+                    os.remove(self.blobPath(digest))
+                except OSError:
+                    pass
+
+# on-disk cache of raw arrays saved as .npy files and loaded memory-mapped
+# keeps at most max_entries files, dropping the least recently used ones
+class ArrayCache:
+    def __init__(self, cache_dir, max_entries=8):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return array
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, array):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not cache {key}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".npy")]
+        except OSError:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[self.max_entries:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+# enforces the retention quotas on wallpapers, leaked fonts, stale temp files and cache files
+# sizes and ages come from os.scandir stat data, newest files are kept first
+# files in protect are never removed, and each sweep runs at most once per interval
+class RetentionManager:
+    def __init__(self, wallpaper_dir, cache_dir, quotas=None, interval=600):
+        self.wallpaper_dir = wallpaper_dir
+        self.cache_dir = cache_dir
+        self.quotas = {kind: dict(limits, **(quotas or {}).get(kind, {})) for kind, limits in RETENTION_DEFAULTS.items()}
+        self.interval = interval
+        self.stamp_path = os.path.join(wallpaper_dir, ".retention")
+
+    # sorts a file in the wallpaper directory into a retention kind, or None to leave it alone
+    def classify(self, name):
+        if name.startswith(".") and name.endswith(".tmp"):
+            return "temp"
+        if name.startswith("wallpaper_"):
+            return "wallpapers"
+        if name.startswith("font_") and name.endswith(".ttf"):
+            return "fonts"
+        return None
+
+    # lists (path, size, mtime) per kind without any extra stat calls
+    def scan(self):
+        files = {kind: [] for kind in self.quotas}
+        try:
+            for entry in os.scandir(self.wallpaper_dir):
+                kind = self.classify(entry.name)
+                if kind and entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files[kind].append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError as e:
+            print(f"Could not scan {self.wallpaper_dir}: {e}")
+
+        pending = [self.cache_dir]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name != "index.json":
+                    stat = entry.stat(follow_symlinks=False)
+                    kind = "temp" if entry.name.endswith(".tmp") else "cache"
+                    files[kind].append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    # returns the files that fall outside the quota, keeping the newest ones first
+    def expired(self, files, quota, protect, now):
+        max_count = quota.get("max_count")
+        max_bytes = None if quota.get("max_mb") is None else quota["max_mb"] * 1024 * 1024
+        max_age = None if quota.get("max_age_hours") is None else quota["max_age_hours"] * 3600
+        kept_count, kept_bytes, remove = 0, 0, []
+        for path, size, mtime in sorted(files, key=lambda f: f[2], reverse=True):
+            if path in protect:
+                kept_count += 1
+                kept_bytes += size
+            elif ((max_age is not None and now - mtime > max_age)
+                    or (max_count is not None and kept_count >= max_count)
+                    or (max_bytes is not None and kept_bytes + size > max_bytes)):
+                remove.append(path)
+            else:
+                kept_count += 1
+                kept_bytes += size
+        return remove
+
+    # runs a sweep unless another one (from any process) ran less than interval seconds ago
+    # returns whether a sweep ran
+    def maybeRun(self, protect=()):
+        try:
+            if time.time() - os.stat(self.stamp_path).st_mtime < self.interval:
+                return False
+        except OSError:
+            pass
+        with open(self.stamp_path, "a"):
+            pass
+        os.utime(self.stamp_path)
+        self.run(protect)
+        return True
+
+    # deletes everything over quota; files that vanished meanwhile are skipped
+    def run(self, protect=()):
+        protect = {os.path.abspath(p) for p in protect if p}
+        now = time.time()
+        removed, freed = 0, 0
+        for kind, files in self.scan().items():
+            sizes = {path: size for path, size, _ in files}
+            for path in self.expired(files, self.quotas[kind], protect, now):
+                try:
+                    os.remove(path)
+                    removed += 1
+                    freed += sizes[path]
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Could not delete {path}: {e}")
+        if removed:
+            print(f"Retention removed {removed} files ({freed / 1024 / 1024:.1f} MB)")
+
+# raised inside a render once its forge has been cancelled
+class RenderCancelled(Exception):
+    pass
+
 # main class
 class WallpaperForge:
     # initalizes with config 
-    def __init__(self, config):
+    def __init__(self, config, session=None):
         self.config = config
+        self.session = session or get_session()
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.wallpaper_dir = os.path.expanduser("~/.wallpaper_forge/")
+        self.wallpaper_dir = WALLPAPER_DIR
         os.makedirs(self.wallpaper_dir, exist_ok=True)
-        self.imagePath = os.path.join(self.wallpaper_dir, f"wallpaper_{self.timestamp}.png")
-        self.width, self.height = 3840, 2160
-        self.font_path = os.path.join(self.wallpaper_dir, f"font_{self.timestamp}.ttf")
-        print("Downloading font...")
-        self.downloadFont()
+        cache_mb = self.config.get("download_cache_mb", 200)
+        self.download_cache = DownloadCache(os.path.join(CACHE_DIR, "downloads"), cache_mb * 1024 * 1024, self.session)
+        self.font_cache = DownloadCache(os.path.join(CACHE_DIR, "fonts"), 50 * 1024 * 1024, self.session)
+        self.base_cache = ArrayCache(os.path.join(CACHE_DIR, "bases"), self.config.get("base_cache_entries", 8))
+        self.layer_cache = ArrayCache(os.path.join(CACHE_DIR, "layers"), self.config.get("base_cache_entries", 8))
+        self.noise_cache = ArrayCache(os.path.join(CACHE_DIR, "noise"), 16)
+        self.retention = RetentionManager(
+            self.wallpaper_dir, CACHE_DIR, self.config.get("retention", {}),
+            self.config.get("retention_interval_minutes", 10) * 60
+        )
+        self.written_path = None
+        # set when the last generate found nothing to change and reused the previous file
+        self.skipped = False
+        # optional callback(stage, percent) and a flag checked between render stages
+        self.progress = None
+        self.cancelled = threading.Event()
+        self.imagePath = self.wallpaperPath()
+        # when set, the last frame is kept so clock ticks can redraw only the time block
+        self.incremental = False
+        self.last_render = None
+        self.pending_write = None
+        self.width, self.height = WALLPAPER_SIZE
+        # fraction of full resolution being rendered, below 1 only during renderProxy
+        self.scale = 1
+        self.last_resources = None
+        self.preview_fingerprint = None
+        self.font_path = self.systemFontPath()
 
     # downloads the font from Google Fonts or uses system default (this seems to be buggy on Windows) 
+    # fonts live in a cache keyed by URL and are only revalidated every font_revalidate_hours
+    # returns the path of the font to use
     def downloadFont(self):
         font_url = self.config.get("google_font_url", "").strip() 
         if font_url.startswith("http"):
-            try:
-                print(f"Fetching font from: {font_url}")
-                res = requests.get(font_url, timeout=10)
-                if res.status_code == 200:
-                    with open(self.font_path, "wb") as f:
-                        f.write(res.content)
-                    print("Font downloaded successfully")
-                    return
-                else:
-                    print(f"Font download failed with status: {res.status_code}")
-            except Exception as e:
-                print(f"Failed to download custom font: {e}")
+            max_age = self.config.get("font_revalidate_hours", 24) * 3600
+
+            def attempt(timeout):
+                return self.font_cache.fetch(font_url, timeout=timeout, max_age=max_age)
+
+            print(f"Fetching font from: {font_url}")
+            entry = self.retryPolicy("font").call(attempt, "Font download")
+            if entry:
+                print(f"Using cached font: {entry['path']}")
+                return entry["path"]
+
+        font_path = self.systemFontPath()
+        print(f"Using font: {font_path}")
+        return font_path
 
+    # picks a default font for the platform
+    def systemFontPath(self):
         if sys.platform.startswith("darwin"):
-            self.font_path = "/System/Library/Fonts/Helvetica.ttc"
+            return "/System/Library/Fonts/Helvetica.ttc"
         elif sys.platform.startswith("linux"):
             possible_fonts = [
                 "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
@@ -87,14 +767,62 @@ class WallpaperForge:
             ]
             for font in possible_fonts:
                 if os.path.exists(font):
-                    self.font_path = font
-                    break
-            else:
-                self.font_path = None  
+                    return font
+            return None
         else: 
-            self.font_path = "C:/Windows/Fonts/arial.ttf"
-        
-        print(f"Using font: {self.font_path}")
+            return "C:/Windows/Fonts/arial.ttf"
+
+    # runs the font, image, message and weather fetches concurrently under one deadline
+    # fetches still running at the deadline are abandoned and their fallbacks used
+    def fetchResources(self):
+        jobs = {
+            "font": self.downloadFont,
+            "image": self.getImage,
+        }
+        if self.config.get("show_message", False):
+            jobs["message"] = self.getMessage
+        if self.config.get("show_weather", True):
+            jobs["weather"] = self.getWeather
+
+        results = {}
+
+        def run(name, fn):
+            try:
+                results[name] = fn()
+            except Exception as e:
+                print(f"Error fetching {name}: {e}")
+
+        threads = [
+            threading.Thread(target=run, args=(name, fn), name=f"wp-fetch-{name}", daemon=True)
+            for name, fn in jobs.items()
+        ]
+        for thread in threads:
+            thread.start()
+        end = time.monotonic() + self.config.get("fetch_deadline", 30)
+        for thread in threads:
+            while thread.is_alive() and time.monotonic() < end:
+                self.checkCancelled()
+                thread.join(min(0.1, max(0, end - time.monotonic())))
+        self.checkCancelled()
+
+        results = dict(results)
+        for name in jobs:
+            if name not in results:
+                print(f"Fetching {name} did not finish in time, using fallback")
+
+        image, digest = results.get("image", (None, None))
+        if "font" in results:
+            self.font_path = results["font"]
+        return {
+            "image": image,
+            "digest": digest if image is not None else "fallback",
+            "message": results.get("message", "Message unavailable"),
+            "weather": results.get("weather", "Weather unavailable"),
+            # renders that reuse these resources (GUI previews) share one decode of the
+            # source and one resized proxy base per size
+            "decode_lock": threading.Lock(),
+            "proxy_bases": {},
+        }
 
     # retrieves the message based on config settings
     def getMessage(self):
@@ -108,18 +836,19 @@ class WallpaperForge:
             else:
                 return "Custom message not set"
         elif msg_type == "Quote":
-            try:
-                print("Fetching quote...")
-                res = requests.get("https://zenquotes.io/api/random", timeout=5)
-                if res.status_code == 200:
-                    data = res.json()[0]
-                    quote = f'"{data["q"]}"\n– {data["a"]}'
-                    print("Quote fetched successfully")
-                    return quote
-                else:
+            def attempt(timeout):
+                res = self.session.get("https://zenquotes.io/api/random", timeout=timeout)
+                if res.status_code != 200:
                     print(f"Quote API returned status: {res.status_code}")
-            except Exception as e:
-                print(f"Error fetching quote: {e}")
+                    return None
+                data = res.json()[0]
+                return f'"{data["q"]}"\n– {data["a"]}'
+
+            print("Fetching quote...")
+            quote = self.retryPolicy("quote").call(attempt, "Quote fetch")
+            if quote:
+                print("Quote fetched successfully")
+                return quote
             return "Quote unavailable"
         else: 
             hour = datetime.now().hour
@@ -138,70 +867,97 @@ class WallpaperForge:
     def getWeather(self):
         location = self.config.get("weather_location", "Phoenix,AZ")
         print(f"Getting weather for: {location}")
-        try:
-            url = f"https://wttr.in/{location}?format=%C+%t+%h"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                weather = response.text.strip()
-                print(f"Weather: {weather}")
-                return weather
-            else:
+        url = f"https://wttr.in/{location}?format=%C+%t+%h"
+
+        def attempt(timeout):
+            response = self.session.get(url, timeout=timeout)
+            if response.status_code != 200:
                 print(f"Weather API returned status: {response.status_code}")
-        except Exception as e:
-            print(f"Error getting weather: {e}")
+                return None
+            return response.text.strip()
+
+        weather = self.retryPolicy("weather").call(attempt, "Weather fetch")
+        if weather:
+            print(f"Weather: {weather}")
+            return weather
         return "Weather unavailable"
 
     # retrieves image from configured source
-    # retries up to 3 times if download fails
-    def getImage(self, retries=3):
+    # retries with backoff under the "image" retry policy if download fails
+    # returns (image, digest), or (None, None) when every attempt failed
+    def getImage(self, retries=None):
         src = self.config.get("image_source", "Picsum")
         print(f"Getting image from source: {src}")
-        attempt = 0
-        while attempt < retries:
-            try:
-                if "Picsum" in src or src == "Picsum":
-                    url = "https://picsum.photos/3840/2160"
-                    print(f"Fetching image from Picsum (attempt {attempt+1})...")
-                    response = requests.get(url, timeout=15)
-                    if response.status_code == 200:
-                        print("Image downloaded successfully")
-                        return Image.open(BytesIO(response.content))
-                    else:
-                        print(f"Image download failed with status: {response.status_code}")
-                elif "Custom" in src or src == "Custom URL":
-                    custom_url = self.config.get("custom_url", "")
-                    if custom_url.strip():
-                        print(f"Fetching image from custom URL: {custom_url}")
-                        response = requests.get(custom_url.strip(), timeout=15)
-                        if response.status_code == 200:
-                            print("Custom image downloaded successfully")
-                            return Image.open(BytesIO(response.content))
-                        else:
-                            print(f"Custom image download failed with status: {response.status_code}")
-                    else:
-                        print("No custom URL provided, trying Picsum as fallback")
-                        url = "https://picsum.photos/3840/2160"
-                        print(f"Fetching fallback image from Picsum (attempt {attempt+1})...")
-                        response = requests.get(url, timeout=15)
-                        if response.status_code == 200:
-                            print("Fallback image downloaded successfully")
-                            return Image.open(BytesIO(response.content))
-                else:
-                    print(f"Unknown image source '{src}', defaulting to Picsum")
-                    url = "https://picsum.photos/3840/2160"
-                    print(f"Fetching image from Picsum (attempt {attempt+1})...")
-                    response = requests.get(url, timeout=15)
-                    if response.status_code == 200:
-                        print("Image downloaded successfully")
-                        return Image.open(BytesIO(response.content))
-                    else:
-                        print(f"Image download failed with status: {response.status_code}")
-            except Exception as e:
-                print(f"Error loading image (attempt {attempt+1}): {e}")
-                attempt += 1
-        
-        print("All image download attempts failed, using fallback")
-        return None
+        policy = self.retryPolicy("image")
+        if retries is not None:
+            policy.attempts = retries
+
+        result = policy.call(lambda timeout: self.fetchImage(src, timeout), "Image download")
+        if result is None:
+            print("All image download attempts failed, using fallback")
+            return None, None
+        return result
+
+    # makes a single attempt at downloading the image, returns None on failure
+    # on success returns (image, sha256 digest of its bytes); the digest keys the base caches
+    def fetchImage(self, src, timeout):
+        if "Custom" in src and "Picsum" not in src:
+            custom_url = self.config.get("custom_url", "").strip()
+            if custom_url:
+                print(f"Fetching image from custom URL: {custom_url}")
+                entry = self.download_cache.fetch(custom_url, timeout=timeout)
+                if entry:
+                    print("Custom image ready")
+                    return Image.open(entry["path"]), entry["digest"]
+                return None
+            print("No custom URL provided, trying Picsum as fallback")
+        elif "Picsum" not in src:
+            print(f"Unknown image source '{src}', defaulting to Picsum")
+
+        print("Fetching image from Picsum...")
+        response = self.session.get("https://picsum.photos/3840/2160", timeout=timeout)
+        if response.status_code != 200:
+            print(f"Image download failed with status: {response.status_code}")
+            return None
+        print("Image downloaded successfully")
+        return self.imageFromResponse(response)
+
+    # builds the retry policy for a kind of fetch from RETRY_DEFAULTS and the "retry" config
+    def retryPolicy(self, kind):
+        settings = dict(RETRY_DEFAULTS[kind])
+        settings.update(self.config.get("retry", {}).get(kind, {}))
+        return RetryPolicy(**settings)
+
+    # opens a downloaded image, returns (image, digest of its bytes)
+    def imageFromResponse(self, response):
+        digest = hashlib.sha256(response.content).hexdigest()
+        return Image.open(BytesIO(response.content)), digest
+
+    # returns the source image decoded and resized to the wallpaper size
+    # resized bases are cached as raw arrays so later renders skip decode and resize
+    # proxy-sized bases are only kept in memory, next to the resources, so they do not
+    # evict full-size ones; the lazily decoded source is only ever decoded under the lock
+    def loadBaseImage(self, img, digest, resources=None):
+        key = f"{digest}_{self.width}x{self.height}"
+        shared = resources if resources is not None else {}
+        lock = shared.get("decode_lock") or threading.Lock()
+        if self.scale != 1:
+            proxy_bases = shared.setdefault("proxy_bases", {})
+            with lock:
+                if key not in proxy_bases:
+                    proxy_bases[key] = img.convert("RGB").resize((self.width, self.height), Image.Resampling.BILINEAR)
+            return proxy_bases[key].copy()
+        cached = self.base_cache.load(key)
+        if cached is not None:
+            print("Using cached base image")
+            return Image.fromarray(cached)
+
+        print("Resizing image...")
+        with lock:
+            img = img.convert("RGB")
+        img = img.resize((self.width, self.height))
+        self.base_cache.store(key, np.asarray(img))
+        return img
 
     # creates a fallback background if image retrieval fails
     def createFallbackBackground(self):
@@ -217,7 +973,142 @@ class WallpaperForge:
         
         if img.mode != 'RGB':
             img = img.convert('RGB')
-        
+
+        if not self.config.get("filter_lut_enabled", True):
+            return self.applyImageFiltersSequential(img)
+        return self.applyCompiledFilters(img)
+
+    # applies filters with consecutive color ops folded into one LUT pass
+    # spatial filters, posterize (adaptive palette), vignette and noise split the runs
+    def applyCompiledFilters(self, img):
+        pending = []
+
+        def flush(img):
+            if pending:
+                img = self.applyColorOps(img, pending)
+                pending.clear()
+            return img
+
+        for key, name in (("brightness", "brightness"), ("contrast", "contrast"), ("saturation", "saturation")):
+            if self.config.get(key, 100) != 100:
+                factor = self.config.get(key, 100) / 100.0
+                pending.append((name, factor))
+                print(f"Applied {name}: {factor}")
+
+        if self.config.get("sharpness", 100) != 100:
+            img = flush(img)
+            factor = self.config.get("sharpness", 100) / 100.0
+            img = self.applyTiled(img, lambda band: ImageEnhance.Sharpness(band).enhance(factor), 1)
+            print(f"Applied sharpness: {factor}")
+
+        if self.config.get("blur_enabled", False):
+            img = flush(img)
+            radius = self.config.get("blur_intensity", 2) * self.scale
+            img = self.applyTiled(img, lambda band: band.filter(ImageFilter.GaussianBlur(radius=radius)), blur_halo(radius))
+            print(f"Applied blur: radius {radius}")
+
+        if self.config.get("edge_enhance_enabled", False):
+            img = self.applyTiled(flush(img), lambda band: band.filter(ImageFilter.EDGE_ENHANCE), 1)
+            print("Applied edge enhance")
+
+        if self.config.get("emboss_enabled", False):
+            img = self.applyTiled(flush(img), lambda band: band.filter(ImageFilter.EMBOSS), 1)
+            print("Applied emboss")
+
+        if self.config.get("grayscale_enabled", False):
+            pending.append(("grayscale",))
+            print("Applied grayscale")
+
+        if self.config.get("sepia_enabled", False):
+            pending.append(("sepia",))
+            print("Applied sepia")
+
+        if self.config.get("invert_enabled", False):
+            pending.append(("invert",))
+            print("Applied invert")
+
+        if self.config.get("posterize_enabled", False):
+            bits = self.config.get("posterize_bits", 4)
+            img = flush(img).quantize(colors=2**bits).convert('RGB')
+            print(f"Applied posterize: {bits} bits")
+
+        if self.config.get("vintage_enabled", False):
+            intensity = self.config.get("vintage_intensity", 50) / 100.0
+            pending.append(("saturation", 0.8))
+            pending.append(("tint", (255, 220, 177), intensity * 0.2))
+            radius = 0.5 * self.scale
+            img = self.applyTiled(flush(img), lambda band: band.filter(ImageFilter.GaussianBlur(radius=radius)), blur_halo(radius))
+            print("Applied vintage effect")
+
+        img = flush(img)
+
+        if self.config.get("vignette_enabled", False):
+            img = self.applyVignette(img)
+            print("Applied vignette")
+
+        if self.config.get("noise_enabled", False):
+            img = self.addNoise(img)
+            print("Applied noise")
+
+        return img
+
+    # number of threads for tiled filtering (filter_workers, 0 means one per core)
+    def filterWorkers(self):
+        workers = self.config.get("filter_workers", 0) or os.cpu_count() or 1
+        return max(1, int(workers))
+
+    # runs fn over horizontal bands of img on the filter thread pool
+    # each band carries halo rows of context above and below, so a spatial filter
+    # with a reach of up to halo pixels gives the same result as a full-frame run
+    def applyTiled(self, img, fn, halo):
+        workers = self.filterWorkers()
+        bands = min(workers, img.height // (4 * halo + 64))
+        if bands <= 1:
+            return fn(img)
+
+        step = -(-img.height // bands)
+
+        def run(top):
+            bottom = min(img.height, top + step)
+            crop_top, crop_bottom = max(0, top - halo), min(img.height, bottom + halo)
+            band = fn(img.crop((0, crop_top, img.width, crop_bottom)))
+            return top, band.crop((0, top - crop_top, img.width, bottom - crop_top))
+
+        out = Image.new(img.mode, img.size)
+        for top, band in filter_pool(workers).map(run, range(0, img.height, step)):
+            out.paste(band, (0, top))
+        return out
+
+    # applies a run of color ops using the passes compiled for them
+    # contrast depends on the image mean, which is estimated from a pixel sample
+    def applyColorOps(self, img, ops):
+        resolved = []
+        sample = None
+        for op in ops:
+            if op[0] == "contrast":
+                if sample is None:
+                    sample = np.asarray(img)[::4, ::4].reshape(-1, 3).astype(np.float64)
+                mean = int(luma(apply_color_ops(sample, resolved)).mean() + 0.5)
+                op = (op[0], op[1], mean)
+            resolved.append(op)
+
+        for kind, value in compile_color_passes(tuple(resolved)):
+            if kind == "point":
+                img = img.point(value)
+            elif kind == "lut":
+                img = self.applyTiled(img, lambda band: band.filter(value), 0)
+            elif value[0] == "saturation":
+                img = ImageEnhance.Color(img).enhance(value[1])
+            elif value[0] == "grayscale":
+                img = img.convert('L').convert('RGB')
+            elif value[0] == "sepia":
+                img = self.applySepia(img)
+            elif value[0] == "tint":
+                img = Image.blend(img, Image.new('RGB', img.size, value[1]), value[2])
+        return img
+
+    # applies filters one full-frame pass at a time (reference for the compiled path)
+    def applyImageFiltersSequential(self, img):
         if self.config.get("brightness", 100) != 100:
             enhancer = ImageEnhance.Brightness(img)
             factor = self.config.get("brightness", 100) / 100.0
@@ -243,7 +1134,7 @@ class WallpaperForge:
             print(f"Applied sharpness: {factor}")
         
         if self.config.get("blur_enabled", False):
-            radius = self.config.get("blur_intensity", 2)
+            radius = self.config.get("blur_intensity", 2) * self.scale
             img = img.filter(ImageFilter.GaussianBlur(radius=radius))
             print(f"Applied blur: radius {radius}")
         
@@ -292,13 +1183,7 @@ class WallpaperForge:
     def applySepia(self, img):
         img_array = np.array(img, dtype=np.float32)
         
-        sepia_filter = np.array([
-            [0.393, 0.769, 0.189],
-            [0.349, 0.686, 0.168],
-            [0.272, 0.534, 0.131]
-        ])
-        
-        sepia_img = img_array @ sepia_filter.T
+        sepia_img = img_array @ SEPIA_MATRIX.T
         sepia_img = np.clip(sepia_img, 0, 255)
         
         return Image.fromarray(sepia_img.astype(np.uint8))
@@ -313,62 +1198,56 @@ class WallpaperForge:
         
         img = Image.blend(img, overlay, intensity * 0.2)
         
-        img = img.filter(ImageFilter.GaussianBlur(radius=0.5))
+        img = img.filter(ImageFilter.GaussianBlur(radius=0.5 * self.scale))
         
         return img
     
-    # applies vignette effect using numpy
+    # applies vignette effect by multiplying with a cached radial mask
     def applyVignette(self, img):
-        width, height = img.size
         intensity = self.config.get("vignette_intensity", 50) / 100.0
-        
-        vignette = Image.new('L', (width, height), 255)
-        draw = ImageDraw.Draw(vignette)
-        
-        center_x, center_y = width // 2, height // 2
-        max_radius = min(width, height) // 2
-        
-        for i in range(50): 
-            alpha = int(255 * (1 - (i / 50) * intensity))
-            radius_x = int(max_radius * (1 + i * 0.02))
-            radius_y = int(max_radius * (1 + i * 0.02))
-            
-            bbox = [
-                center_x - radius_x, center_y - radius_y,
-                center_x + radius_x, center_y + radius_y
-            ]
-            draw.ellipse(bbox, fill=alpha)
-        
-        img_array = np.array(img)
-        vignette_array = np.array(vignette) / 255.0
-        
-        for c in range(3):  
-            img_array[:, :, c] = img_array[:, :, c] * vignette_array
-        
-        return Image.fromarray(img_array.astype(np.uint8))
+        return ImageChops.multiply(img, vignette_mask(img.width, img.height, intensity))
     
-    # adds noise to the image using numpy
+    # returns the int8 film grain tile for an intensity and seed
+    # tiles are generated once and kept in the cache directory
+    def noiseTile(self, intensity, seed):
+        key = f"noise_{intensity}_{seed}_{NOISE_TILE_SIZE}"
+        tile = self.noise_cache.load(key)
+        if tile is None:
+            rng = np.random.default_rng(seed)
+            noise = rng.standard_normal((NOISE_TILE_SIZE, NOISE_TILE_SIZE, 3), dtype=np.float32)
+            tile = np.clip(np.rint(noise * np.float32(intensity)), -127, 127).astype(np.int8)
+            self.noise_cache.store(key, tile)
+        return tile
+
+    # adds film grain by tiling a noise texture over the image with saturating uint8 math
+    # without a noise_seed the tile is shifted randomly so the grain changes every render
     def addNoise(self, img):
-        img_array = np.array(img, dtype=np.float32)
         intensity = self.config.get("noise_intensity", 25)
-        
-        noise = np.random.normal(0, intensity, img_array.shape)
-        
-        noisy_img = img_array + noise
-        noisy_img = np.clip(noisy_img, 0, 255)
-        
-        return Image.fromarray(noisy_img.astype(np.uint8))
+        seed = self.config.get("noise_seed")
+        tile = self.noiseTile(intensity, 0 if seed is None else seed)
+
+        shift = np.random.default_rng(seed).integers(0, NOISE_TILE_SIZE, size=2)
+        tile = np.roll(tile, tuple(shift), axis=(0, 1))
+        reps = (-(-img.height // NOISE_TILE_SIZE), -(-img.width // NOISE_TILE_SIZE), 1)
+        noise = np.tile(tile, reps)[:img.height, :img.width]
 
-    # deletes old wallpapers except the current one
-    def cleanupOldWallpapers(self):
+        positive = Image.fromarray(np.maximum(noise, 0).astype(np.uint8))
+        negative = Image.fromarray((-np.minimum(noise, 0)).astype(np.uint8))
+        return ImageChops.subtract(ImageChops.add(img, positive), negative)
+
+    # removes the wallpaper this forge wrote before (if any), then lets the retention
+    # manager sweep old wallpapers, leaked fonts and cache files when its interval is up
+    # runs on the writer thread, so it never touches a file that is still being written
+    def cleanupOldWallpapers(self, previous=None):
+        if previous and os.path.abspath(previous) != os.path.abspath(self.imagePath):
+            try:
+                os.remove(previous)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not delete {previous}: {e}")
         try:
-            wallpaper_files = [f for f in os.listdir(self.wallpaper_dir) if f.startswith("wallpaper_")]
-            for filename in wallpaper_files:
-                if not filename.endswith(self.timestamp + ".png"):
-                    try:
-                        os.remove(os.path.join(self.wallpaper_dir, filename))
-                    except OSError as e:
-                        print(f"Could not delete {filename}: {e}")
+            self.retention.maybeRun(protect=[self.imagePath])
         except Exception as e:
             print(f"Cleanup error: {e}")
 
@@ -382,23 +1261,10 @@ class WallpaperForge:
 
     # fits text to the image size, returns font and wrapped lines
     def fit_text(self, draw, text, font_path, max_width, max_height, max_font_size=160, min_font_size=30):
-        for size in range(max_font_size, min_font_size - 1, -5):
-            try:
-                if font_path and os.path.exists(font_path):
-                    font = ImageFont.truetype(font_path, size)
-                else:
-                    font = ImageFont.load_default()
-            except:
-                font = ImageFont.load_default()
-            lines = []
-            for paragraph in text.split('\n'):
-                lines.extend(wrap(paragraph, width=40))
-            line_height = font.getbbox("A")[3] + 10
-            total_height = line_height * len(lines)
-            max_line_width = max(draw.textlength(line, font=font) for line in lines)
-            if total_height <= max_height and max_line_width <= max_width:
-                return font, lines
-        return ImageFont.load_default(), wrap(text, width=40)
+        size, lines = fit_text_layout(text, font_path, max_width, max_height, max_font_size, min_font_size)
+        if size is None:
+            return ImageFont.load_default(), wrap(text, width=40)
+        return load_font(font_path, size), list(lines)
 
     # calculates the x position for text to fit within the image width
     def calculate_text_position(self, draw, text_lines, font, margin=100):
@@ -409,16 +1275,34 @@ class WallpaperForge:
         x_position = self.width - max_line_width - margin
         return max(margin, x_position)
 
-    # generates the wallpaper with all components
-    def generateWallpaper(self):
-        print("Starting wallpaper generation...")
-        
-        img = self.getImage() or self.createFallbackBackground()
-        print("Resizing image...")
-        img = img.resize((self.width, self.height))
+    # cache key for the base layer, covering the image source and every filter/overlay setting
+    def baseLayerKey(self, digest):
+        settings = {key: self.config.get(key, DEFAULT_CONFIG[key]) for key in BASE_LAYER_CONFIG_KEYS}
+        payload = json.dumps([digest, self.width, self.height, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # renders the resized, filtered and overlaid background that text is drawn on
+    # the result is cached on disk so text-only refreshes skip the whole image pipeline
+    # resources, when given, are the fetchResources dict the source came from
+    def renderBaseLayer(self, source, digest, resources=None):
+        cacheable = not (
+            self.config.get("filters_enabled", True)
+            and self.config.get("noise_enabled", False)
+            and self.config.get("noise_seed") is None
+        )
+        key = self.baseLayerKey(digest)
+        cacheable = cacheable and self.scale == 1
+        if cacheable:
+            cached = self.layer_cache.load(key)
+            if cached is not None:
+                print("Using cached base layer")
+                return Image.fromarray(cached)
 
+        img = self.loadBaseImage(source, digest, resources) if source is not None else self.createFallbackBackground()
+        self.checkCancelled()
         img = self.applyImageFilters(img)
-    
+        self.checkCancelled()
+
         if self.config.get("overlay_enabled", True):
             print("Applying overlay...")
             overlay_color = self.config.get("overlay_color", "#000000")
@@ -426,103 +1310,409 @@ class WallpaperForge:
             rgb_color = self.hex_to_rgb(overlay_color)
             overlay = Image.new("RGBA", img.size, (*rgb_color, overlay_opacity))
             img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
-        
-        draw = ImageDraw.Draw(img)
 
-        message_font_size = self.config.get("font_size_message", 80)
-        weather_font_size = self.config.get("font_size_weather", 60)
-        time_font_size = self.config.get("font_size_time", 80)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if cacheable:
+            self.layer_cache.store(key, np.asarray(img))
+        return img
 
-        if self.config.get("show_message", False):
-            print("Adding message text...")
-            text = self.getMessage()
-            try:
-                if self.font_path and os.path.exists(self.font_path):
-                    message_font = ImageFont.truetype(self.font_path, message_font_size)
-                else:
-                    message_font = ImageFont.load_default()
-            except:
-                message_font = ImageFont.load_default()
-            
-            lines = []
-            for paragraph in text.split('\n'):
-                lines.extend(wrap(paragraph, width=40))
-            
-            x = 100
-            line_height = message_font.getbbox("A")[3] + 10
-            y = self.height // 2 - (len(lines) * line_height) // 2
-            
-            for line in lines:
-                draw.text((x + 2, y + 2), line, font=message_font, fill="black")
-                draw.text((x, y), line, font=message_font, fill="white")
-                y += line_height
+    # scales a size in full-resolution pixels to the resolution being rendered
+    def px(self, value):
+        return max(1, int(round(value * self.scale)))
+
+    # loads the forge's font at the given (full-resolution) size from the shared font cache
+    def loadFont(self, size):
+        return load_font(self.font_path, self.px(size))
+
+    # the same font at the size matching the resolution being rendered
+    def scaledFont(self, font):
+        if self.scale == 1 or not isinstance(font, ImageFont.FreeTypeFont):
+            return font
+        return load_font(font.path, self.px(font.size), font.index)
+
+    # draws lines of text at (x, y) with a 2px drop shadow and returns the touched box
+    # the glyphs are rasterized once into a mask that is pasted twice, shadow then fill
+    def drawTextBlock(self, img, x, y, lines, font, line_height):
+        mask, (dx, dy) = text_mask(tuple(lines), font, line_height)
+        left, top = int(round(x)) + dx, int(round(y)) + dy
+        shadow = self.px(2)
+        img.paste((0, 0, 0), (left + shadow, top + shadow), mask)
+        img.paste((255, 255, 255), (left, top), mask)
+        return (left, top, left + mask.width + shadow, top + mask.height + shadow)
+
+    # draws the message block centered vertically on the left
+    # the layout is always fitted at full resolution so proxy renders wrap the same way
+    def drawMessage(self, img, text):
+        print("Adding message text...")
+        max_size = self.config.get("font_size_message", 80)
+        full_width, full_height = WALLPAPER_SIZE
+        message_font, lines = self.fit_text(
+            ImageDraw.Draw(img), text, self.font_path,
+            max_width=full_width - 200, max_height=full_height - 600,
+            max_font_size=max_size, min_font_size=min(30, max_size)
+        )
+        message_font = self.scaledFont(message_font)
+
+        x = self.px(100)
+        line_height = message_font.getbbox("A")[3] + self.px(10)
+        y = self.height // 2 - (len(lines) * line_height) // 2
+        return self.drawTextBlock(img, x, y, lines, message_font, line_height)
+
+    # draws the weather line in the bottom left
+    def drawWeather(self, img, weather_text):
+        print("Adding weather text...")
+        weather_font = self.loadFont(self.config.get("font_size_weather", 60))
+        x, y = self.px(100), self.height - self.px(200)
+        line_height = weather_font.getbbox("A")[3] + self.px(10)
+        return self.drawTextBlock(img, x, y, [weather_text], weather_font, line_height)
+
+    # the time and/or date lines as they would be drawn right now
+    def timeLines(self):
+        display = self.config.get("time_display", "Time")
+        time_lines = []
+
+        if display in ("Time", "Both"):
+            now = datetime.now().strftime("%I:%M %p")
+            time_lines.extend(wrap(now, width=40))
+
+        if display in ("Date", "Both"):
+            today = datetime.now().strftime("%A, %b %d")
+            time_lines.extend(wrap(today, width=40))
 
+        return time_lines
+
+    # draws the time and/or date block in the top right
+    def drawTime(self, img):
+        print("Adding time/date text...")
+        y = self.px(100)
+
+        time_lines = self.timeLines()
+        if not time_lines:
+            return None
+
+        time_font = self.loadFont(self.config.get("font_size_time", 80))
+        x = self.calculate_text_position(ImageDraw.Draw(img), time_lines, time_font, margin=self.px(100))
+        line_height = time_font.getbbox("A")[3] + self.px(10)
+        return self.drawTextBlock(img, x, y, time_lines, time_font, line_height)
+
+    # draws the message, weather and time layers on top of the base layer
+    # returns the box of the time block (or None) so clock ticks can redraw just that area
+    def drawTextLayers(self, img, resources):
+        if self.config.get("show_message", False):
+            self.drawMessage(img, resources["message"])
         if self.config.get("show_weather", True):
-            print("Adding weather text...")
-            weather_text = self.getWeather()
-            try:
-                if self.font_path and os.path.exists(self.font_path):
-                    weather_font = ImageFont.truetype(self.font_path, weather_font_size)
+            self.drawWeather(img, resources["weather"])
+        if self.incremental:
+            self.last_render = {
+                "config": json.dumps(self.config, sort_keys=True),
+                "resources": resources,
+                "frame": img,
+                "pre_time": img.copy(),
+                "time_box": None,
+            }
+        if self.config.get("show_time", True):
+            time_box = self.drawTime(img)
+            if self.last_render is not None:
+                self.last_render["time_box"] = time_box
+        return img
+
+    # clamps a box to the image bounds
+    def clampBox(self, box):
+        left, top, right, bottom = box
+        return (max(0, left), max(0, top), min(self.width, right), min(self.height, bottom))
+
+    # renders a clock tick by redrawing only the time block of the previous frame
+    # the old block is restored from the frame as it was before any time text was drawn
+    # falls back to a full render when there is no previous frame or the config changed
+    def updateTime(self):
+        last = self.last_render
+        if last is None or last["config"] != json.dumps(self.config, sort_keys=True):
+            return self.generateWallpaper()
+        if not self.config.get("show_time", True):
+            self.skipped = True
+            return self.imagePath
+
+        fingerprint = self.renderFingerprint(last["resources"])
+        if self.isUnchanged(fingerprint):
+            return self.imagePath
+
+        print("Updating time block...")
+        frame, pre_time = last["frame"], last["pre_time"]
+        if last["time_box"]:
+            box = self.clampBox(last["time_box"])
+            frame.paste(pre_time.crop(box), box[:2])
+        last["time_box"] = self.drawTime(frame)
+
+        # PNG and JPEG have no partial update, so the frame itself is re-encoded
+        self.saveWallpaperAsync(frame, fingerprint)
+        return self.imagePath
+
+    # hashes everything that decides the output file: the base layer key, the resolved
+    # message, weather and time strings, the font and the encoder settings
+    # returns None when the frame is not reproducible (noise without a fixed seed)
+    def renderFingerprint(self, resources):
+        if (self.config.get("filters_enabled", True)
+                and self.config.get("noise_enabled", False)
+                and self.config.get("noise_seed") is None):
+            return None
+        payload = {
+            "base": self.baseLayerKey(resources["digest"]),
+            "message": resources.get("message") if self.config.get("show_message", False) else None,
+            "weather": resources.get("weather") if self.config.get("show_weather", True) else None,
+            "time": self.timeLines() if self.config.get("show_time", True) else None,
+            "font": self.font_path,
+            "font_sizes": [self.config.get(key, DEFAULT_CONFIG[key]) for key in ("font_size_message", "font_size_weather", "font_size_time")],
+            "encoder": self.encoderOptions(),
+            "png_parallel": self.config.get("png_parallel", False),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    # checks the fingerprint against the last written wallpaper (from any process)
+    # on a match the previous file is reused, skipped is set and True is returned
+    # the daemon needs one drawn frame for its clock ticks, so it always draws the first
+    def isUnchanged(self, fingerprint):
+        self.skipped = False
+        if fingerprint is None or (self.incremental and self.last_render is None):
+            return False
+        try:
+            with open(LAST_RENDER_PATH) as f:
+                last = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if last.get("fingerprint") != fingerprint or not os.path.exists(last.get("path", "")):
+            return False
+        print("Render inputs unchanged, keeping the current wallpaper")
+        self.imagePath = last["path"]
+        self.skipped = True
+        return True
+
+    # remembers which inputs produced the file at path
+    def recordRender(self, fingerprint, path):
+        if fingerprint is None:
+            return
+        try:
+            write_atomic(LAST_RENDER_PATH, json.dumps({"fingerprint": fingerprint, "path": path}).encode())
+        except OSError as e:
+            print(f"Could not record render: {e}")
+
+    # returns the output format and PIL save options from the config
+    def encoderOptions(self):
+        fmt = str(self.config.get("output_format", "PNG")).upper()
+        if fmt == "JPEG":
+            return fmt, {
+                "quality": self.config.get("jpeg_quality", 90),
+                "subsampling": self.config.get("jpeg_subsampling", "4:2:0"),
+            }
+        if fmt == "WEBP":
+            return fmt, {
+                "lossless": self.config.get("webp_lossless", False),
+                "quality": self.config.get("webp_quality", 90),
+            }
+        return "PNG", {"compress_level": self.config.get("png_compress_level", 6)}
+
+    # path of the wallpaper file for the current timestamp and output format
+    def wallpaperPath(self, fmt=None):
+        extension = OUTPUT_EXTENSIONS[fmt or self.encoderOptions()[0]]
+        return os.path.join(self.wallpaper_dir, f"wallpaper_{self.timestamp}{extension}")
+
+    # encodes the frame with every BENCHMARK_ENCODERS setting and prints time and size
+    def benchmarkEncoders(self, img):
+        results = []
+        for fmt, options in BENCHMARK_ENCODERS:
+            buffer = BytesIO()
+            start = time.perf_counter()
+            img.save(buffer, format=fmt, **options)
+            elapsed = time.perf_counter() - start
+            label = fmt + " " + ", ".join(f"{key}={value}" for key, value in options.items())
+            results.append({"encoder": label, "seconds": elapsed, "bytes": buffer.tell()})
+            print(f"{label:<45} {elapsed * 1000:8.0f} ms {buffer.tell() / 1e6:8.2f} MB")
+
+        for level in (1, 6):
+            buffer = BytesIO()
+            start = time.perf_counter()
+            write_png_parallel(img, buffer, level, self.encoderWorkers())
+            elapsed = time.perf_counter() - start
+            label = f"PNG parallel compress_level={level}"
+            results.append({"encoder": label, "seconds": elapsed, "bytes": buffer.tell()})
+            print(f"{label:<45} {elapsed * 1000:8.0f} ms {buffer.tell() / 1e6:8.2f} MB")
+        return results
+
+    # number of threads for parallel PNG encoding (encoder_workers, 0 means one per core)
+    def encoderWorkers(self):
+        workers = self.config.get("encoder_workers", 0) or os.cpu_count() or 1
+        return max(1, int(workers))
+
+    # everything the writer needs, read from the config in one go:
+    # (format, PIL save options, parallel PNG worker count or None)
+    def encoderSettings(self):
+        fmt, options = self.encoderOptions()
+        workers = self.encoderWorkers() if fmt == "PNG" and self.config.get("png_parallel", False) else None
+        return fmt, options, workers
+
+    # encodes img to path atomically: a hidden temp file in the same directory, then a rename
+    # the fingerprint of the inputs is recorded once the file is in place
+    # encoder comes from encoderSettings() when the path was picked, so a config reload
+    # between picking the path and writing cannot change the format under the extension
+    def writeWallpaper(self, img, path, fingerprint=None, encoder=None):
+        fmt, options, workers = encoder or self.encoderSettings()
+        print(f"Saving wallpaper as {fmt}...")
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                if workers:
+                    write_png_parallel(img, f, options["compress_level"], workers)
                 else:
-                    weather_font = ImageFont.load_default()
-            except:
-                weather_font = ImageFont.load_default()
-            x, y = 100, self.height - 200
-            draw.text((x + 2, y + 2), weather_text, font=weather_font, fill="black")
-            draw.text((x, y), weather_text, font=weather_font, fill="white")
-
-        if self.config.get("show_time", True): 
-            print("Adding time/date text...")
-            display = self.config.get("time_display", "Time")
-            y = 100
-            
-            time_lines = []
-            
-            if display in ("Time", "Both"):
-                now = datetime.now().strftime("%I:%M %p")
-                time_lines.extend(wrap(now, width=40))
-                
-            if display in ("Date", "Both"):
-                today = datetime.now().strftime("%A, %b %d")
-                time_lines.extend(wrap(today, width=40))
-            
-            if time_lines:
-                try:
-                    if self.font_path and os.path.exists(self.font_path):
-                        time_font = ImageFont.truetype(self.font_path, time_font_size)
-                    else:
-                        time_font = ImageFont.load_default()
-                except:
-                    time_font = ImageFont.load_default()
-                
-                x = self.calculate_text_position(draw, time_lines, time_font, margin=100)
-                
-                current_y = y
-                if display in ("Time", "Both"):
-                    now = datetime.now().strftime("%I:%M %p")
-                    lines = wrap(now, width=40)
-                    for line in lines:
-                        draw.text((x + 2, current_y + 2), line, font=time_font, fill="black")
-                        draw.text((x, current_y), line, font=time_font, fill="white")
-                        current_y += time_font.getbbox("A")[3] + 10
-                        
-                if display in ("Date", "Both"):
-                    today = datetime.now().strftime("%A, %b %d")
-                    lines = wrap(today, width=40)
-                    for line in lines:
-                        draw.text((x + 2, current_y + 2), line, font=time_font, fill="black")
-                        draw.text((x, current_y), line, font=time_font, fill="white")
-                        current_y += time_font.getbbox("A")[3] + 10
-
-        print("Saving wallpaper...")
-        img.save(self.imagePath)
-        print("Cleaning up old wallpapers...")
-        self.cleanupOldWallpapers()
+                    img.save(f, format=fmt, **options)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.recordRender(fingerprint, path)
+        return path
+
+    # picks a new timestamped path for the next save, never the current path or an existing file,
+    # so desktops that ignore an unchanged URI always see a new one
+    def nextImagePath(self, fmt=None):
+        previous = self.imagePath
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.timestamp, count = stamp, 0
+        while self.wallpaperPath(fmt) == previous or os.path.exists(self.wallpaperPath(fmt)):
+            count += 1
+            self.timestamp = f"{stamp}_{count}"
+        self.imagePath = self.wallpaperPath(fmt)
         return self.imagePath
 
+    # writes the frame to a new timestamped file; old wallpapers are removed on the writer thread
+    def saveWallpaper(self, img, fingerprint=None):
+        previous = self.written_path
+        encoder = self.encoderSettings()
+        path = self.written_path = self.writeWallpaper(img, self.nextImagePath(encoder[0]), fingerprint, encoder)
+        wallpaper_writer().submit(self.cleanupOldWallpapers, previous)
+        return path
+
+    # like saveWallpaper, but encoding and writing also run on the background writer thread
+    # returns a future for the final path; cleanup is queued behind it, off the critical path
+    def saveWallpaperAsync(self, img, fingerprint=None):
+        encoder = self.encoderSettings()
+        path = self.nextImagePath(encoder[0])
+        if self.incremental:
+            img = img.copy()
+        previous, self.written_path = self.written_path, path
+        self.pending_write = wallpaper_writer().submit(self.writeWallpaper, img, path, fingerprint, encoder)
+        wallpaper_writer().submit(self.cleanupOldWallpapers, previous)
+        return self.pending_write
+
+    # asks a running render to stop at its next stage boundary
+    def cancel(self):
+        self.cancelled.set()
+
+    # raises RenderCancelled once cancel() has been called
+    def checkCancelled(self):
+        if self.cancelled.is_set():
+            raise RenderCancelled()
+
+    # passes the current stage to the progress callback, after checking for cancellation
+    def reportStage(self, stage, percent):
+        self.checkCancelled()
+        if self.progress is not None:
+            self.progress(stage, percent)
+
+    # renders the wallpaper with all components and returns it without saving
+    # pass already fetched resources (e.g. last_resources) to skip the fetch
+    def renderWallpaper(self, resources=None):
+        if resources is None:
+            self.reportStage("Fetching resources", 0)
+            resources = self.fetchResources()
+        self.last_resources = resources
+        self.reportStage("Rendering background", 40)
+        img = self.renderBaseLayer(resources["image"], resources["digest"], resources)
+        self.reportStage("Drawing text", 75)
+        return self.drawTextLayers(img, resources)
+
+    # sets the fraction of full resolution to render at
+    def setScale(self, scale):
+        self.scale = scale
+        self.width, self.height = (max(1, int(round(side * scale))) for side in WALLPAPER_SIZE)
+
+    # renders at a fraction of full resolution (e.g. 1/4 or 1/8) and returns the image unsaved
+    # blur radii, font sizes, margins and the shadow offset are scaled to match; 3x3 kernels
+    # (sharpness, edge enhance, emboss) act on proxy pixels, so those look a bit stronger
+    def renderProxy(self, scale, resources=None):
+        self.setScale(scale)
+        try:
+            return self.renderWallpaper(resources)
+        finally:
+            self.setScale(1)
+
+    # generates the wallpaper with all components
+    # when the inputs match the last written wallpaper, that file is reused without drawing
+    # with proxy_scale set, returns a reduced-resolution image instead (see renderProxy)
+    def generateWallpaper(self, proxy_scale=None, resources=None):
+        if proxy_scale:
+            return self.renderProxy(proxy_scale, resources)
+        print("Starting wallpaper generation...")
+        if resources is None:
+            self.reportStage("Fetching resources", 0)
+            resources = self.fetchResources()
+        self.last_resources = resources
+        fingerprint = self.renderFingerprint(resources)
+        if not self.isUnchanged(fingerprint):
+            img = self.renderWallpaper(resources)
+            self.reportStage("Saving", 90)
+            self.saveWallpaper(img, fingerprint)
+        self.reportStage("Done", 100)
+        return self.imagePath
+
+    # renders the full frame in memory plus a thumbnail that fits max_size, writing nothing
+    # returns (frame, thumbnail); the frame is only written if it is passed to applyFrame
+    def generatePreview(self, max_size=(400, 225)):
+        print("Starting wallpaper generation...")
+        self.reportStage("Fetching resources", 0)
+        resources = self.fetchResources()
+        self.preview_fingerprint = self.renderFingerprint(resources)
+        frame = self.renderWallpaper(resources)
+        self.reportStage("Scaling preview", 95)
+        ratio = min(max_size[0] / frame.width, max_size[1] / frame.height)
+        size = (max(1, round(frame.width * ratio)), max(1, round(frame.height * ratio)))
+        thumbnail = frame.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        self.reportStage("Done", 100)
+        return frame, thumbnail
+
+    # writes a frame from generatePreview (unless the same inputs were already written)
+    # and sets it as the wallpaper; returns the path that was set
+    # without a frame, one is rendered first from resources (fetched when not given)
+    def applyFrame(self, frame=None, resources=None):
+        if frame is None:
+            if resources is None:
+                self.reportStage("Fetching resources", 0)
+                resources = self.fetchResources()
+            self.preview_fingerprint = self.renderFingerprint(resources)
+            frame = self.renderWallpaper(resources)
+        self.reportStage("Saving", 80)
+        if not self.isUnchanged(self.preview_fingerprint):
+            self.saveWallpaper(frame, self.preview_fingerprint)
+        self.reportStage("Setting wallpaper", 90)
+        self.setWallpaper()
+        return self.imagePath
+
+    # renders the wallpaper and hands encoding and writing to the background writer
+    # returns a future that resolves to the final path once the file is in place
+    # (or None when the inputs are unchanged and the previous file is reused)
+    def generateWallpaperAsync(self):
+        print("Starting wallpaper generation...")
+        resources = self.fetchResources()
+        fingerprint = self.renderFingerprint(resources)
+        if self.isUnchanged(fingerprint):
+            return None
+        return self.saveWallpaperAsync(self.renderWallpaper(resources), fingerprint)
+
     # sets wallpaper based on the platform
     # uses AppleScript for macOS, gnome for Linux, and ctypes for Windows
     def setWallpaper(self):
+        if self.pending_write is not None:
+            self.pending_write.result()
         path = self.imagePath
         print(f"Setting wallpaper: {path}")
         if sys.platform.startswith("darwin"):
@@ -547,14 +1737,45 @@ def load_config():
         except Exception as e:
             print(f"Error loading config: {e}")
     try:
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(DEFAULT_CONFIG, f, indent=2)
+        save_config(DEFAULT_CONFIG)
         print(f"Created default config at: {CONFIG_PATH}")
     except Exception as e:
         print(f"Could not create config: {e}")
     return DEFAULT_CONFIG.copy()
 
+# writes the config atomically, so readers such as the daemon never see a half-written file
+def save_config(config):
+    write_atomic(CONFIG_PATH, json.dumps(config, indent=2).encode())
+
+# keeps the wallpaper's clock current, redrawing only the time block every minute
+# does a full render (fresh image, quote and weather) every full_refresh_minutes
+# a failed tick is logged and forces a full render on the next one; the loop keeps going
+def run_daemon(forge):
+    forge.incremental = True
+    last_full = None
+    while True:
+        try:
+            forge.config = load_config()
+            refresh = forge.config.get("full_refresh_minutes", 30) * 60
+            if last_full is None or time.monotonic() - last_full >= refresh:
+                forge.generateWallpaperAsync()
+                last_full = time.monotonic()
+            else:
+                forge.updateTime()
+            if not forge.skipped:
+                forge.setWallpaper()
+        except Exception as e:
+            print(f"Daemon tick failed: {e}")
+            import traceback
+            traceback.print_exc()
+            forge.pending_write = None
+            forge.last_render = None
+            last_full = None
+        time.sleep(60 - time.time() % 60)
+
 # main function to run the wallpaper generation (w/ debug printing!)
+# pass --daemon to keep running and update the clock every minute
+# pass --benchmark to compare output encoders on the current frame
 def main():
     try:
         print("Loading configuration...")
@@ -562,8 +1783,19 @@ def main():
         print(f"Configuration loaded: {config}")
         
         forge = WallpaperForge(config)
+        if "--daemon" in sys.argv:
+            print("Running as daemon...")
+            run_daemon(forge)
+            return
+        if "--benchmark" in sys.argv:
+            print("Benchmarking encoders...")
+            forge.benchmarkEncoders(forge.renderWallpaper())
+            return
         print("Generating wallpaper...")
         wallpaper_path = forge.generateWallpaper()
+        if forge.skipped:
+            print(f"Wallpaper unchanged: {wallpaper_path}")
+            return
         print(f"Wallpaper generated: {wallpaper_path}")
         print("Setting wallpaper...")
         forge.setWallpaper()